@@ -1,8 +1,19 @@
 """
 裁切编辑器 - 可视化裁切框调整窗口
 """
+import math
 import tkinter as tk
-from PIL import Image, ImageTk
+from PIL import ImageTk
+
+from tile_pyramid import PREVIEW_KEY, TileCache, TileLoader, TilePyramid
+
+
+# 每次滚轮缩放的倍率
+ZOOM_STEP = 1.25
+# 最大缩放（400%，便于逐像素定位）
+MAX_ZOOM = 4.0
+# 后台瓦片轮询间隔（毫秒）
+POLL_INTERVAL = 30
 
 
 class CropEditor:
@@ -12,16 +23,17 @@ class CropEditor:
         self.image_path = image_path
         self.on_confirm = on_confirm
         
+        # 分块金字塔（只读取文件头，像素按需在后台解码）
+        # 先于窗口创建，图片无法打开时直接抛出异常，不留下空窗口
+        self.pyramid = TilePyramid(image_path)
+        self.orig_w, self.orig_h = self.pyramid.width, self.pyramid.height
+        
         # 创建窗口
         self.window = tk.Toplevel(parent)
         self.window.title("裁切编辑器 - iPhone 17 Pro")
         self.window.geometry("900x700")
         self.window.configure(bg='#ffffff')
         
-        # 加载原始图片
-        self.original_image = Image.open(image_path)
-        self.orig_w, self.orig_h = self.original_image.size
-        
         # 目标比例
         self.target_ratio = 1206 / 2622
         
@@ -31,10 +43,25 @@ class CropEditor:
         
         scale_w = max_display_width / self.orig_w
         scale_h = max_display_height / self.orig_h
-        self.scale = min(scale_w, scale_h, 1.0)  # 不放大，只缩小
-        
-        self.display_w = int(self.orig_w * self.scale)
-        self.display_h = int(self.orig_h * self.scale)
+        self.scale = min(scale_w, scale_h, 1.0)  # 适应窗口的缩放，也是最小缩放
+        
+        self.display_w = max(1, int(self.orig_w * self.scale))
+        self.display_h = max(1, int(self.orig_h * self.scale))
+        
+        # 视图状态：缩放级别及画布左上角对应的原图坐标
+        self.zoom_index = 0
+        self.max_zoom_index = max(0, int(math.log(MAX_ZOOM / self.scale) / math.log(ZOOM_STEP)))
+        self.zoom = self.scale
+        self.view_x = 0.0
+        self.view_y = 0.0
+        
+        # 瓦片缓存与后台解码
+        self.tile_cache = TileCache()
+        self.tile_loader = TileLoader(self.pyramid)
+        self.tile_items = {}
+        self.pending_tiles = set()
+        # 低分辨率预览图，真实瓦片到达前用于拉伸出占位瓦片
+        self.preview = None
         
         # 创建UI
         self.create_ui()
@@ -48,13 +75,20 @@ class CropEditor:
         self.drag_start_x = 0
         self.drag_start_y = 0
         self.resize_handle = None  # 'nw', 'ne', 'sw', 'se'
+        self.panning = False
+        
+        self.window.protocol("WM_DELETE_WINDOW", self.cancel)
+        
+        # 绘制首屏瓦片并开始轮询后台结果
+        self.render_tiles()
+        self.poll_id = self.window.after(POLL_INTERVAL, self.poll_tiles)
         
     def create_ui(self):
         """创建界面元素"""
         # 标题
         title_label = tk.Label(
             self.window,
-            text="拖动裁切框调整位置，拖动角控制点调整大小",
+            text="拖动裁切框调整位置，拖动角控制点调整大小；滚轮缩放，右键或框外拖动平移",
             font=("Microsoft YaHei UI", 10),
             bg='#ffffff',
             fg='#64748b'
@@ -75,14 +109,6 @@ class CropEditor:
         )
         self.canvas.pack()
         
-        # 显示图片
-        display_image = self.original_image.resize(
-            (self.display_w, self.display_h),
-            Image.LANCZOS
-        )
-        self.photo = ImageTk.PhotoImage(display_image)
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
-        
         # 绘制半透明遮罩（初始化为空，后面会更新）
         self.mask_ids = []
         
@@ -111,6 +137,25 @@ class CropEditor:
         self.canvas.bind('<B1-Motion>', self.on_mouse_move)
         self.canvas.bind('<ButtonRelease-1>', self.on_mouse_up)
         
+        # 平移（右键）与缩放（滚轮：Windows/macOS 为 MouseWheel，X11 为 Button-4/5）
+        self.canvas.bind('<ButtonPress-3>', self.on_pan_start)
+        self.canvas.bind('<B3-Motion>', self.on_pan_move)
+        self.canvas.bind('<ButtonRelease-3>', self.on_mouse_up)
+        self.canvas.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.canvas.bind('<Button-4>', self.on_mouse_wheel)
+        self.canvas.bind('<Button-5>', self.on_mouse_wheel)
+        
+        # 缩放比例显示
+        self.zoom_var = tk.StringVar()
+        zoom_label = tk.Label(
+            self.window,
+            textvariable=self.zoom_var,
+            font=("Microsoft YaHei UI", 9),
+            bg='#ffffff',
+            fg='#64748b'
+        )
+        zoom_label.pack()
+        
         # 按钮区域
         btn_frame = tk.Frame(self.window, bg='#ffffff')
         btn_frame.pack(pady=20)
@@ -156,33 +201,42 @@ class CropEditor:
         
     def init_crop_box(self):
         """初始化裁切框位置（撑满图片，居中）"""
-        # 计算在显示图片上的初始裁切框（尽可能撑满）
-        current_ratio = self.display_w / self.display_h
+        # 计算在原图上的初始裁切框（尽可能撑满）
+        current_ratio = self.orig_w / self.orig_h
         
         if current_ratio > self.target_ratio:
             # 图片太宽，裁切框以高度撑满
-            crop_h = self.display_h
-            crop_w = int(crop_h * self.target_ratio)
+            crop_h = self.orig_h
+            crop_w = crop_h * self.target_ratio
             # 水平居中
-            self.crop_x = (self.display_w - crop_w) // 2
+            self.crop_x = (self.orig_w - crop_w) / 2
             self.crop_y = 0
         else:
             # 图片太高或刚好，裁切框以宽度撑满
-            crop_w = self.display_w
-            crop_h = int(crop_w / self.target_ratio)
+            crop_w = self.orig_w
+            crop_h = crop_w / self.target_ratio
             # 垂直居中
             self.crop_x = 0
-            self.crop_y = (self.display_h - crop_h) // 2
+            self.crop_y = (self.orig_h - crop_h) / 2
         
         self.crop_w = crop_w
         self.crop_h = crop_h
         
         self.update_crop_display()
     
+    def to_canvas(self, x, y):
+        """原图坐标转换为画布坐标"""
+        return (x - self.view_x) * self.zoom, (y - self.view_y) * self.zoom
+    
+    def crop_canvas_box(self):
+        """裁切框在画布上的坐标"""
+        x1, y1 = self.to_canvas(self.crop_x, self.crop_y)
+        x2, y2 = self.to_canvas(self.crop_x + self.crop_w, self.crop_y + self.crop_h)
+        return x1, y1, x2, y2
+    
     def update_crop_display(self):
         """更新裁切框显示"""
-        x1, y1 = self.crop_x, self.crop_y
-        x2, y2 = self.crop_x + self.crop_w, self.crop_y + self.crop_h
+        x1, y1, x2, y2 = self.crop_canvas_box()
         
         # 更新矩形
         self.canvas.coords(self.crop_rect, x1, y1, x2, y2)
@@ -212,9 +266,12 @@ class CropEditor:
             self.canvas.delete(mask_id)
         self.mask_ids = []
         
-        # 创建四个遮罩矩形（裁切框外部）
-        x1, y1 = self.crop_x, self.crop_y
-        x2, y2 = self.crop_x + self.crop_w, self.crop_y + self.crop_h
+        # 创建四个遮罩矩形（裁切框外部，限制在画布范围内）
+        x1, y1, x2, y2 = self.crop_canvas_box()
+        x1 = min(max(x1, 0), self.display_w)
+        x2 = min(max(x2, 0), self.display_w)
+        y1 = min(max(y1, 0), self.display_h)
+        y2 = min(max(y2, 0), self.display_h)
         
         # 上
         if y1 > 0:
@@ -274,13 +331,16 @@ class CropEditor:
                 return
         
         # 检查是否点击裁切框内部
-        x1, y1 = self.crop_x, self.crop_y
-        x2, y2 = self.crop_x + self.crop_w, self.crop_y + self.crop_h
+        x1, y1, x2, y2 = self.crop_canvas_box()
         
         if x1 <= event.x <= x2 and y1 <= event.y <= y2:
             self.dragging = True
             self.drag_start_x = event.x
             self.drag_start_y = event.y
+            return
+        
+        # 裁切框外部：平移视图
+        self.on_pan_start(event)
     
     def on_mouse_move(self, event):
         """鼠标拖动"""
@@ -288,17 +348,149 @@ class CropEditor:
             self.handle_resize(event)
         elif self.dragging:
             self.handle_drag(event)
+        elif self.panning:
+            self.on_pan_move(event)
     
     def on_mouse_up(self, event):
         """鼠标释放"""
         self.dragging = False
         self.resizing = False
+        self.panning = False
         self.resize_handle = None
     
-    def handle_drag(self, event):
-        """处理拖动移动"""
+    def on_pan_start(self, event):
+        """开始平移视图"""
+        self.panning = True
+        self.drag_start_x = event.x
+        self.drag_start_y = event.y
+    
+    def on_pan_move(self, event):
+        """平移视图"""
+        if not self.panning:
+            return
         dx = event.x - self.drag_start_x
         dy = event.y - self.drag_start_y
+        self.drag_start_x = event.x
+        self.drag_start_y = event.y
+        
+        self.set_view(self.view_x - dx / self.zoom, self.view_y - dy / self.zoom)
+    
+    def on_mouse_wheel(self, event):
+        """滚轮缩放（以鼠标位置为中心）"""
+        if event.num == 4 or event.delta > 0:
+            new_index = self.zoom_index + 1
+        else:
+            new_index = self.zoom_index - 1
+        new_index = min(max(new_index, 0), self.max_zoom_index)
+        if new_index == self.zoom_index:
+            return
+        
+        # 鼠标下方的原图坐标在缩放前后保持不变
+        anchor_x = event.x / self.zoom + self.view_x
+        anchor_y = event.y / self.zoom + self.view_y
+        
+        self.zoom_index = new_index
+        self.zoom = self.scale * ZOOM_STEP ** new_index
+        self.set_view(anchor_x - event.x / self.zoom, anchor_y - event.y / self.zoom)
+    
+    def set_view(self, view_x, view_y):
+        """设置视图位置（限制在图片范围内）并刷新"""
+        max_x = max(0.0, self.orig_w - self.display_w / self.zoom)
+        max_y = max(0.0, self.orig_h - self.display_h / self.zoom)
+        self.view_x = min(max(view_x, 0.0), max_x)
+        self.view_y = min(max(view_y, 0.0), max_y)
+        
+        self.render_tiles()
+        self.update_crop_display()
+    
+    def visible_tiles(self):
+        """当前视野内的瓦片 {key: 画布坐标}"""
+        size = self.pyramid.tile_size
+        _, _, cols, rows = self.pyramid.grid_size(self.zoom)
+        off_x = self.view_x * self.zoom
+        off_y = self.view_y * self.zoom
+        
+        col0 = max(0, int(off_x // size))
+        row0 = max(0, int(off_y // size))
+        col1 = min(cols - 1, int((off_x + self.display_w - 1) // size))
+        row1 = min(rows - 1, int((off_y + self.display_h - 1) // size))
+        
+        tiles = {}
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                tiles[(self.zoom, col, row)] = (col * size - off_x, row * size - off_y)
+        return tiles
+    
+    def render_tiles(self):
+        """绘制视野内已缓存的瓦片，其余交给后台解码"""
+        self.zoom_var.set(f"缩放 {self.zoom * 100:.0f}%")
+        
+        visible = self.visible_tiles()
+        
+        # 移除视野外的瓦片
+        for key in list(self.tile_items):
+            if key not in visible:
+                item, _ = self.tile_items.pop(key)
+                self.canvas.delete(item)
+        
+        missing = []
+        for key, (x, y) in visible.items():
+            photo = self.tile_cache.get(key)
+            if photo is None and key not in self.pending_tiles:
+                missing.append(key)
+            
+            entry = self.tile_items.get(key)
+            if entry is not None and (photo is None or entry[1] is photo):
+                # 已绘制（真实瓦片，或等待真实瓦片的占位瓦片）
+                self.canvas.coords(entry[0], x, y)
+                continue
+            
+            if photo is None:
+                if self.preview is None:
+                    continue
+                # 真实瓦片到达前先用预览图拉伸出占位，缩放时画面不会变黑
+                photo = ImageTk.PhotoImage(self.pyramid.render_placeholder(self.preview, *key))
+            if entry is not None:
+                self.canvas.delete(entry[0])
+            
+            item = self.canvas.create_image(x, y, anchor=tk.NW, image=photo)
+            self.canvas.tag_lower(item)
+            # 保留引用，避免被缓存淘汰后画面变空
+            self.tile_items[key] = (item, photo)
+        
+        self.pending_tiles.update(missing)
+        self.tile_loader.request(missing, visible)
+    
+    def poll_tiles(self):
+        """取回后台解码完成的瓦片"""
+        arrived = False
+        for key, tile in self.tile_loader.poll():
+            if key == PREVIEW_KEY:
+                self.preview = tile
+                arrived = True
+                continue
+            self.pending_tiles.discard(key)
+            if tile is not None:
+                # PhotoImage 只能在主线程创建
+                self.tile_cache.put(key, ImageTk.PhotoImage(tile))
+                arrived = True
+        
+        if arrived:
+            self.render_tiles()
+        self.poll_id = self.window.after(POLL_INTERVAL, self.poll_tiles)
+    
+    def close(self):
+        """关闭窗口并停止后台解码"""
+        self.window.after_cancel(self.poll_id)
+        self.tile_loader.stop()
+        self.tile_cache.clear()
+        self.preview = None
+        self.window.destroy()
+    
+    def handle_drag(self, event):
+        """处理拖动移动"""
+        dx = (event.x - self.drag_start_x) / self.zoom
+        dy = (event.y - self.drag_start_y) / self.zoom
         
         new_x = self.crop_x + dx
         new_y = self.crop_y + dy
@@ -308,10 +500,10 @@ class CropEditor:
             new_x = 0
         if new_y < 0:
             new_y = 0
-        if new_x + self.crop_w > self.display_w:
-            new_x = self.display_w - self.crop_w
-        if new_y + self.crop_h > self.display_h:
-            new_y = self.display_h - self.crop_h
+        if new_x + self.crop_w > self.orig_w:
+            new_x = self.orig_w - self.crop_w
+        if new_y + self.crop_h > self.orig_h:
+            new_y = self.orig_h - self.crop_h
         
         self.crop_x = new_x
         self.crop_y = new_y
@@ -322,50 +514,51 @@ class CropEditor:
     
     def handle_resize(self, event):
         """处理调整大小（保持比例）"""
-        dx = event.x - self.drag_start_x
-        dy = event.y - self.drag_start_y
+        dx = (event.x - self.drag_start_x) / self.zoom
+        dy = (event.y - self.drag_start_y) / self.zoom
         
         handle = self.resize_handle
         
         # 根据拖动的角计算新尺寸
         if handle == 'se':  # 右下角
             new_w = self.crop_w + dx
-            new_h = int(new_w / self.target_ratio)
+            new_h = new_w / self.target_ratio
         elif handle == 'sw':  # 左下角
             new_w = self.crop_w - dx
-            new_h = int(new_w / self.target_ratio)
+            new_h = new_w / self.target_ratio
             new_x = self.crop_x + dx
         elif handle == 'ne':  # 右上角
             new_w = self.crop_w + dx
-            new_h = int(new_w / self.target_ratio)
+            new_h = new_w / self.target_ratio
             new_y = self.crop_y - (new_h - self.crop_h)
         elif handle == 'nw':  # 左上角
             new_w = self.crop_w - dx
-            new_h = int(new_w / self.target_ratio)
+            new_h = new_w / self.target_ratio
             new_x = self.crop_x + dx
             new_y = self.crop_y - (new_h - self.crop_h)
         else:
             return
         
-        # 最小尺寸限制
-        if new_w < 50 or new_h < 50:
+        # 最小尺寸限制（按屏幕像素计）
+        min_size = 50 / self.zoom
+        if new_w < min_size or new_h < min_size:
             return
         
         # 边界检查
         if handle in ['sw', 'nw']:
-            if new_x < 0 or new_x + new_w > self.display_w:
+            if new_x < 0 or new_x + new_w > self.orig_w:
                 return
             self.crop_x = new_x
         else:
-            if self.crop_x + new_w > self.display_w:
+            if self.crop_x + new_w > self.orig_w:
                 return
         
         if handle in ['ne', 'nw']:
-            if new_y < 0 or new_y + new_h > self.display_h:
+            if new_y < 0 or new_y + new_h > self.orig_h:
                 return
             self.crop_y = new_y
         else:
-            if self.crop_y + new_h > self.display_h:
+            if self.crop_y + new_h > self.orig_h:
                 return
         
         self.crop_w = new_w
@@ -381,15 +574,15 @@ class CropEditor:
     
     def cancel(self):
         """取消编辑"""
-        self.window.destroy()
+        self.close()
     
     def confirm(self):
         """确认裁切"""
-        # 将显示坐标转换为原图坐标
-        real_x = int(self.crop_x / self.scale)
-        real_y = int(self.crop_y / self.scale)
-        real_w = int(self.crop_w / self.scale)
-        real_h = int(self.crop_h / self.scale)
+        # 裁切框已是原图坐标，取整即可
+        real_x = int(self.crop_x)
+        real_y = int(self.crop_y)
+        real_w = int(self.crop_w)
+        real_h = int(self.crop_h)
         
         crop_box = {
             'x': real_x,
@@ -398,5 +591,5 @@ class CropEditor:
             'height': real_h
         }
         
-        self.window.destroy()
+        self.close()
         self.on_confirm(self.image_path, crop_box)
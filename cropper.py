@@ -1,6 +1,6 @@
+import argparse
 import os
 from PIL import Image
-import sys
 
 def smart_crop(input_path, output_path):
     """
@@ -91,16 +91,78 @@ def manual_crop(input_path, output_dir, crop_box):
         print(f"手动裁切失败 {input_path}: {e}")
         return False
 
+def hash_threshold(value):
+    """--dedup 阈值：0~64 的整数（64 位哈希中不同的位数）"""
+    try:
+        threshold = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"阈值必须是整数: {value}")
+    if not 0 <= threshold <= 64:
+        raise argparse.ArgumentTypeError(f"阈值必须在 0~64 之间: {value}")
+    return threshold
+
+def crop_with_dedup(paths, output_dir, threshold):
+    """
+    去重后批量裁切：每组只裁切一张代表图片，其余复制其结果
+    :param threshold: 汉明距离阈值，None 表示默认值
+    """
+    import dedup
+
+    if threshold is None:
+        threshold = dedup.DEFAULT_THRESHOLD
+    groups = dedup.group_duplicates(paths, threshold)
+    copied = set()
+    failed = set()
+
+    for group in groups:
+        # 依次尝试，第一张裁切成功的图片作为代表
+        rep = None
+        for path in group:
+            print(f"\n正在处理: {os.path.basename(path)}...")
+            if smart_crop(path, os.path.join(output_dir, os.path.basename(path))):
+                rep = path
+                break
+            failed.add(path)
+        if rep is None:
+            continue
+
+        # 代表图片移到组首，报告中据此显示
+        group.remove(rep)
+        group.insert(0, rep)
+
+        rep_out = os.path.join(output_dir, os.path.basename(rep))
+        for dup in group[1:]:
+            if dup in failed:
+                continue
+            dup_out = os.path.join(output_dir, os.path.basename(dup))
+            if dedup.copy_duplicate(rep_out, dup_out):
+                copied.add(dup)
+                continue
+            # 无法复用代表图片的结果时单独裁切，保证每张图片都有输出
+            print(f"\n正在处理: {os.path.basename(dup)}...")
+            if not smart_crop(dup, dup_out):
+                failed.add(dup)
+
+    dedup.write_report(groups, copied, failed, os.path.join(output_dir, "dedup_report.txt"))
+
 def main():
-    if len(sys.argv) < 2:
-        print("用法: python cropper.py <input_image_or_directory> [output_directory]")
-        return
+    parser = argparse.ArgumentParser(description="将图片居中裁切为 1206:2622 比例")
+    parser.add_argument('input_path', help="图片文件或文件夹")
+    parser.add_argument('output_dir', nargs='?', default="output", help="输出文件夹（默认 output）")
+    parser.add_argument(
+        '--dedup', nargs='?', const=True, type=hash_threshold, metavar='阈值',
+        help="目录模式下跳过近似重复图片，只裁切每组代表图片（需要 numpy）；"
+             "自定义阈值请写作 --dedup=N（0~64，默认 4）"
+    )
+    args = parser.parse_args()
 
-    input_path = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "output"
+    input_path = args.input_path
+    output_dir = args.output_dir
 
     if os.path.isfile(input_path):
         # 处理单文件
+        if args.dedup is not None:
+            print("--dedup 仅用于文件夹，单个文件将直接处理")
         filename = os.path.basename(input_path)
         output_path = os.path.join(output_dir, filename)
         smart_crop(input_path, output_path)
@@ -111,11 +173,16 @@ def main():
             print("未找到支持的图片文件")
             return
         
-        for f in files:
-            in_p = os.path.join(input_path, f)
-            out_p = os.path.join(output_dir, f)
+        paths = [os.path.join(input_path, f) for f in files]
+        if args.dedup is not None:
+            threshold = None if args.dedup is True else args.dedup
+            crop_with_dedup(paths, output_dir, threshold)
+            return
+
+        for in_p in paths:
+            f = os.path.basename(in_p)
             print(f"\n正在处理: {f}...")
-            smart_crop(in_p, out_p)
+            smart_crop(in_p, os.path.join(output_dir, f))
     else:
         print("无效的输入路径")
 
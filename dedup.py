@@ -0,0 +1,169 @@
+"""
+近似重复检测 - 批量裁切时跳过几乎相同的图片（如连续截图）
+
+使用差值哈希（dHash）：图片缩小为灰度，比较相邻像素亮度得到 64 位哈希，
+汉明距离小于阈值即视为近似重复。分组使用 BK 树，避免两两比较。
+
+只有 JPEG 能以缩小比例直接解码；PNG、WEBP 计算哈希时需要完整解码，
+代表图片裁切时还会再解码一次。
+"""
+import os
+import shutil
+
+import numpy as np
+from PIL import Image
+
+
+# 哈希网格：9x8 灰度图，水平相邻像素比较得到 8x8=64 位
+HASH_W, HASH_H = 9, 8
+
+# 默认阈值（64 位中不同位数）
+DEFAULT_THRESHOLD = 4
+
+
+def load_thumbnail(path):
+    """解码图片并缩小为 9x8 灰度数组，失败返回 None"""
+    try:
+        with Image.open(path) as img:
+            # JPEG 可直接按 1/8 比例解码，省去完整解码；其他格式无效果
+            img.draft('L', (HASH_W * 8, HASH_H * 8))
+            img = img.convert('L')
+            img = img.resize((HASH_W, HASH_H), Image.BILINEAR, reducing_gap=2.0)
+            return np.asarray(img, dtype=np.int16)
+    except Exception as e:
+        print(f"哈希计算失败 {path}: {e}")
+        return None
+
+
+def dhash_batch(thumbnails):
+    """批量计算 dHash，输入 (n, 8, 9) 数组，返回 n 个 64 位整数"""
+    bits = thumbnails[:, :, 1:] > thumbnails[:, :, :-1]
+    packed = np.packbits(bits.reshape(len(thumbnails), -1), axis=1)
+    return [int(h) for h in packed.view('>u8').ravel()]
+
+
+def hamming(a, b):
+    """两个哈希的汉明距离"""
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """按汉明距离组织的 BK 树，用于快速查找相近哈希"""
+    def __init__(self):
+        self.root = None
+
+    def add(self, hash_value, item):
+        node = (hash_value, item, {})
+        if self.root is None:
+            self.root = node
+            return
+
+        current = self.root
+        while True:
+            dist = hamming(hash_value, current[0])
+            child = current[2].get(dist)
+            if child is None:
+                current[2][dist] = node
+                return
+            current = child
+
+    def search(self, hash_value, max_dist):
+        """返回距离不超过 max_dist 的所有 [(距离, item)]"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_hash, item, children = stack.pop()
+            dist = hamming(hash_value, node_hash)
+            if dist <= max_dist:
+                found.append((dist, item))
+            # 三角不等式：只有距离在 [dist-max_dist, dist+max_dist] 的子树可能命中
+            for child_dist, child in children.items():
+                if dist - max_dist <= child_dist <= dist + max_dist:
+                    stack.append(child)
+        return found
+
+
+def group_duplicates(paths, threshold=DEFAULT_THRESHOLD):
+    """
+    将图片按近似重复分组
+    :param paths: 图片路径列表
+    :param threshold: 汉明距离阈值
+    :return: 分组列表，每组第一个为代表图片，保持输入顺序
+    """
+    thumbnails = [load_thumbnail(p) for p in paths]
+    valid = [i for i, t in enumerate(thumbnails) if t is not None]
+
+    hashes = {}
+    if valid:
+        batch = np.stack([thumbnails[i] for i in valid])
+        hashes = dict(zip(valid, dhash_batch(batch)))
+
+    tree = BKTree()
+    groups = []
+    for i, path in enumerate(paths):
+        if i not in hashes:
+            # 无法计算哈希，单独处理
+            groups.append([path])
+            continue
+
+        matches = tree.search(hashes[i], threshold)
+        if matches:
+            # 归入最相近的代表图片所在组
+            _, group_index = min(matches)
+            groups[group_index].append(path)
+        else:
+            tree.add(hashes[i], len(groups))
+            groups.append([path])
+
+    return groups
+
+
+def copy_duplicate(rep_output, dup_output):
+    """
+    将代表图片的裁切结果复制为重复图片的输出
+    扩展名不同时按重复图片的格式重新保存，不再解码原图
+    :return: 是否成功
+    """
+    ext = os.path.splitext(dup_output)[1].lower()
+    try:
+        if os.path.splitext(rep_output)[1].lower() == ext:
+            shutil.copyfile(rep_output, dup_output)
+            return True
+
+        with Image.open(rep_output) as img:
+            # JPEG 不支持透明通道
+            if ext in ('.jpg', '.jpeg') and img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            img.save(dup_output, quality=95, subsampling=0)
+        return True
+    except Exception as e:
+        print(f"复用裁切结果失败 {dup_output}: {e}")
+        return False
+
+
+def write_report(groups, copied, failed, report_path):
+    """
+    写出去重报告
+    :param groups: 分组列表，每组第一个为代表图片
+    :param copied: 复用代表图片结果（未单独裁切）的重复图片路径集合
+    :param failed: 裁切失败的图片路径集合
+    """
+    duplicate_groups = [g for g in groups if len(g) > 1]
+    skipped = len(copied)
+
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(f"共 {sum(len(g) for g in groups)} 张图片，{len(groups)} 组，跳过 {skipped} 张近似重复\n")
+        for group in duplicate_groups:
+            rep_status = " (裁切失败)" if group[0] in failed else ""
+            f.write(f"\n代表: {os.path.basename(group[0])}{rep_status}\n")
+            for path in group[1:]:
+                if path in copied:
+                    status = "已复制"
+                elif path in failed:
+                    status = "裁切失败"
+                else:
+                    status = "单独裁切"
+                f.write(f"  重复: {os.path.basename(path)} ({status})\n")
+
+    print(f"去重报告: {report_path}（跳过 {skipped} 张近似重复）")
@@ -4,12 +4,12 @@ SmartCropper - iPhone 17 Pro 智能裁切工具
 """
 import os
 import sys
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
-import windnd
 
-from crop_editor import CropEditor
-from cropper import manual_crop
+# 注意：PIL、crop_editor、cropper 等图片相关模块在首次拖入图片时才导入，
+# 以缩短 Python 层的启动时间，见 startup_bench.py
 
 
 def resource_path(relative_path):
@@ -48,7 +48,12 @@ class App:
         # 创建UI
         self._create_ui()
         
-        # 注册拖拽回调
+        # 窗口显示后再注册拖拽回调
+        self.root.after_idle(self._hook_drop)
+    
+    def _hook_drop(self):
+        """注册拖拽回调"""
+        import windnd
         windnd.hook_dropfiles(self.root, func=self.on_drop)
     
     def _setup_icon(self):
@@ -136,8 +141,15 @@ class App:
                 self.status_var.set("正在打开编辑器...")
                 self.root.update()
                 
+                # 首次使用时才加载图片模块
+                from crop_editor import CropEditor
+                
                 # 打开裁切编辑器
-                CropEditor(self.root, path_str, self.on_crop_confirmed)
+                try:
+                    CropEditor(self.root, path_str, self.on_crop_confirmed)
+                except Exception as e:
+                    self.status_var.set("无法打开图片")
+                    messagebox.showerror("错误", f"无法打开图片：\n{path_str}\n\n{e}")
                 break  # 一次只处理一张图片
     
     def on_crop_confirmed(self, image_path, crop_box):
@@ -145,6 +157,8 @@ class App:
         self.status_var.set("正在裁切...")
         self.root.update()
         
+        from cropper import manual_crop
+        
         output_dir = os.path.dirname(image_path)
         result = manual_crop(image_path, output_dir, crop_box)
         
@@ -164,9 +178,31 @@ class App:
             messagebox.showerror("错误", "图片裁切失败，请重试")
 
 
+def trace_first_window(root):
+    """启动追踪：窗口首次显示时输出时间戳和已加载的图片模块，
+    再导入首次拖入图片时才加载的模块并输出其耗时，然后退出"""
+    def on_map(event):
+        if event.widget is not root:
+            return
+        heavy = sorted(m for m in ('PIL', 'crop_editor', 'cropper', 'windnd') if m in sys.modules)
+        print(f"first_window {time.time():.6f}", flush=True)
+        print(f"loaded_modules {','.join(heavy)}", flush=True)
+        
+        # 模拟首次拖入图片时的延迟导入（与 on_drop / on_crop_confirmed 相同）
+        print("startup_trace: first_drop", file=sys.stderr, flush=True)
+        start = time.perf_counter()
+        import crop_editor
+        import cropper
+        print(f"first_drop_import {time.perf_counter() - start:.6f}", flush=True)
+        root.after(0, root.destroy)
+    root.bind('<Map>', on_map)
+
+
 def main():
     """程序入口"""
     root = tk.Tk()
+    if os.environ.get('SMARTCROPPER_STARTUP_TRACE'):
+        trace_first_window(root)
     app = App(root)
     root.mainloop()
 
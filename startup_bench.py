@@ -0,0 +1,129 @@
+"""
+启动性能测试 - 测量首个窗口出现的时间、首次拖入图片时的导入耗时及各模块导入耗时
+
+用法:
+    python startup_bench.py
+    python startup_bench.py --runs 10 --budget 800 --drop-budget 500
+
+只测试源码版 pure_cropper.py。启动时若已加载图片模块（PIL、crop_editor、
+cropper），或首窗时间中位数超过 --budget、首次拖入的导入耗时中位数超过
+--drop-budget（毫秒），以非零状态码退出，便于发现性能回退。
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# 启动阶段不应加载的模块（应在首次拖入图片时才导入）
+LAZY_MODULES = ('PIL', 'crop_editor', 'cropper')
+
+# pure_cropper 在窗口出现后、开始延迟导入前向 stderr 输出的分隔标记
+FIRST_DROP_MARKER = 'startup_trace: first_drop'
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_once(cmd):
+    """启动一次程序，返回 (首窗耗时秒, 首次拖入导入耗时秒, 已加载模块列表, stderr)"""
+    env = dict(os.environ, SMARTCROPPER_STARTUP_TRACE='1')
+    start = time.time()
+    proc = subprocess.run(cmd, env=env, cwd=HERE, capture_output=True, text=True, timeout=120)
+
+    first_window = None
+    first_drop = None
+    loaded = []
+    for line in proc.stdout.splitlines():
+        if line.startswith('first_window '):
+            first_window = float(line.split()[1]) - start
+        elif line.startswith('first_drop_import '):
+            first_drop = float(line.split()[1])
+        elif line.startswith('loaded_modules '):
+            loaded = [m for m in line.split(' ', 1)[1].split(',') if m]
+
+    if first_window is None or first_drop is None:
+        raise RuntimeError(f"程序未输出启动追踪信息:\n{proc.stdout}\n{proc.stderr}")
+    return first_window, first_drop, loaded, proc.stderr
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 输出
+    :return: (启动阶段, 首次拖入阶段)，各为顶层模块 [(累计微秒, 自身微秒, 模块名)]
+    """
+    startup, first_drop = [], []
+    results = startup
+    for line in stderr.splitlines():
+        if line.strip() == FIRST_DROP_MARKER:
+            results = first_drop
+            continue
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # 表头
+        name = parts[2]
+        # 缩进表示被其他模块间接导入，只统计顶层导入
+        if name.startswith('  '):
+            continue
+        results.append((int(parts[1]), int(parts[0]), name.strip()))
+    return sorted(startup, reverse=True), sorted(first_drop, reverse=True)
+
+
+def print_imports(title, imports, top):
+    """输出导入耗时表"""
+    print(f"\n{title}（前 {top} 个顶层模块）:")
+    print(f"{'累计(ms)':>10} {'自身(ms)':>10}  模块")
+    for cumulative, self_us, name in imports[:top]:
+        print(f"{cumulative / 1000:>10.1f} {self_us / 1000:>10.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartCropper 启动性能测试")
+    parser.add_argument('--runs', type=int, default=5, help="重复次数（默认 5）")
+    parser.add_argument('--budget', type=float, help="首窗时间中位数上限（毫秒）")
+    parser.add_argument('--drop-budget', type=float, help="首次拖入图片导入耗时中位数上限（毫秒）")
+    parser.add_argument('--top', type=int, default=15, help="显示导入耗时最多的模块数")
+    args = parser.parse_args()
+
+    cmd = [sys.executable, os.path.join(HERE, 'pure_cropper.py')]
+
+    # 计时运行不带 -X importtime，避免导入插桩拉长耗时
+    timings = []
+    drop_timings = []
+    loaded = []
+    for i in range(args.runs):
+        elapsed, drop, loaded, _ = run_once(cmd)
+        timings.append(elapsed * 1000)
+        drop_timings.append(drop * 1000)
+        print(f"第 {i + 1} 次: 首窗 {elapsed * 1000:.0f} ms, 首次拖入导入 {drop * 1000:.0f} ms")
+
+    median = statistics.median(timings)
+    drop_median = statistics.median(drop_timings)
+    print(f"\n首窗时间: 中位数 {median:.0f} ms, 最快 {min(timings):.0f} ms, 最慢 {max(timings):.0f} ms")
+    print(f"首次拖入导入: 中位数 {drop_median:.0f} ms, 最快 {min(drop_timings):.0f} ms, 最慢 {max(drop_timings):.0f} ms")
+
+    # 单独运行一次获取导入耗时（该次不计入上面的时间）
+    _, _, _, stderr = run_once([sys.executable, '-X', 'importtime'] + cmd[1:])
+    startup_imports, drop_imports = parse_importtime(stderr)
+    print_imports("启动阶段导入耗时", startup_imports, args.top)
+    print_imports("首次拖入图片时导入耗时", drop_imports, args.top)
+
+    failed = False
+    eager = [m for m in loaded if m in LAZY_MODULES]
+    if eager:
+        print(f"\n失败: 启动时已加载 {', '.join(eager)}，应延迟到首次拖入图片时导入")
+        failed = True
+    if args.budget is not None and median > args.budget:
+        print(f"\n失败: 首窗时间 {median:.0f} ms 超过上限 {args.budget:.0f} ms")
+        failed = True
+    if args.drop_budget is not None and drop_median > args.drop_budget:
+        print(f"\n失败: 首次拖入导入耗时 {drop_median:.0f} ms 超过上限 {args.drop_budget:.0f} ms")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+分块金字塔 - 为超大图片提供按需解码的多级分辨率瓦片
+"""
+import math
+import queue
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+
+# 瓦片边长（屏幕像素）
+TILE_SIZE = 256
+
+# 占位预览图的最长边（像素）
+PREVIEW_SIZE = 2048
+# 后台线程送回预览图时使用的键
+PREVIEW_KEY = 'preview'
+
+# 编辑器只打开用户自己拖入的本地图片，放宽 Pillow 的解压炸弹保护
+# （默认约 1.79 亿像素即报错）。超过该值发出警告，超过两倍（约 40 亿像素）仍会报错。
+MAX_IMAGE_PIXELS = 2_000_000_000
+if Image.MAX_IMAGE_PIXELS is not None and Image.MAX_IMAGE_PIXELS < MAX_IMAGE_PIXELS:
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+
+class TilePyramid:
+    """多级分辨率金字塔（按需构建）
+
+    第 0 级为原图，第 k 级为原图缩小 2^k 倍。各级只在首次用到时生成，
+    且只应在同一个后台线程中访问。
+
+    内存：第 1 级及以上各级合计不超过原图的 1/3，生成后一直保留；只有第 0 级
+    （原图）在切换到其他级时释放。Pillow 只能整张解码，因此缩放超过 50% 时
+    需要把整张原图解码到内存。非 JPEG 图片首次打开也要完整解码一次，并顺带
+    生成全部缩小级，之后缩放不再重复解码（JPEG 可按比例直接解码各级）。
+    """
+    def __init__(self, image_path, tile_size=TILE_SIZE):
+        self.image_path = image_path
+        self.tile_size = tile_size
+
+        # 只读取文件头获取尺寸，不解码像素
+        with Image.open(image_path) as img:
+            self.width, self.height = img.size
+            self.format = img.format
+
+        # 最高一级：缩到一块瓦片以内即可
+        longest = max(self.width, self.height)
+        self.max_level = max(0, math.ceil(math.log2(longest / tile_size)))
+
+        self.levels = {}
+        # 解码失败的级别 {level: 异常}，避免每块瓦片重复尝试
+        self.failed = {}
+
+    def level_for_zoom(self, zoom):
+        """选择分辨率不低于显示需要的最粗一级"""
+        if zoom >= 1.0:
+            return 0
+        level = int(math.floor(math.log2(1.0 / zoom)))
+        return min(level, self.max_level)
+
+    def preview_level(self):
+        """最长边不超过 PREVIEW_SIZE 的最精细一级，用作缩放时的占位图"""
+        longest = max(self.width, self.height)
+        level = max(0, math.ceil(math.log2(longest / PREVIEW_SIZE)))
+        return min(level, self.max_level)
+
+    def level_size(self, level):
+        """第 level 级的图片尺寸"""
+        factor = 2 ** level
+        return (-(-self.width // factor), -(-self.height // factor))
+
+    def get_level(self, level):
+        """获取（必要时构建）第 level 级图片"""
+        if level not in self.levels:
+            if level in self.failed:
+                raise self.failed[level]
+            try:
+                self.levels[level] = self._build_level(level)
+            except Exception as e:
+                print(f"第 {level} 级解码失败 {self.image_path}: {e}")
+                self.failed[level] = e
+                raise
+
+        # 只释放原图；缩小级无法由更粗的级别重建，全部保留
+        if level > 0:
+            self.levels.pop(0, None)
+        return self.levels[level]
+
+    def _build_level(self, level):
+        """生成第 level 级图片"""
+        # 优先从已构建的更精细一级缩小
+        finer = [k for k in self.levels if k < level]
+        if finer:
+            base = max(finer)
+            return self.levels[base].reduce(2 ** (level - base))
+
+        if level > 0 and self.format == 'JPEG':
+            # JPEG 可直接以缩小比例解码，避免先解码整张原图
+            img = Image.open(self.image_path)
+            img.draft('RGB', self.level_size(level))
+            img = self._normalize(img)
+            if img.size != self.level_size(level):
+                img = img.resize(self.level_size(level), Image.LANCZOS)
+            return img
+
+        # 完整解码原图，并逐级生成所有缺少的缩小级
+        full = self._normalize(Image.open(self.image_path))
+        prev = full
+        for k in range(1, self.max_level + 1):
+            if k not in self.levels:
+                self.levels[k] = prev.reduce(2)
+            prev = self.levels[k]
+        return full if level == 0 else self.levels[level]
+
+    def _normalize(self, img):
+        """转换为 Tk 可显示的色彩模式"""
+        img.load()
+        if img.mode in ('RGB', 'RGBA', 'L'):
+            return img
+        if 'A' in img.mode or 'transparency' in img.info:
+            return img.convert('RGBA')
+        return img.convert('RGB')
+
+    def grid_size(self, zoom):
+        """指定缩放下整张图片的像素尺寸和瓦片行列数"""
+        full_w = max(1, round(self.width * zoom))
+        full_h = max(1, round(self.height * zoom))
+        cols = -(-full_w // self.tile_size)
+        rows = -(-full_h // self.tile_size)
+        return full_w, full_h, cols, rows
+
+    def render_tile(self, zoom, col, row):
+        """渲染一块屏幕瓦片（在后台线程调用）"""
+        level = self.level_for_zoom(zoom)
+        # 放大时用最近邻，便于逐像素精确定位
+        resample = Image.NEAREST if zoom > 1.0 else Image.LANCZOS
+        return self._resize_tile(self.get_level(level), level, zoom, col, row, resample)
+
+    def render_placeholder(self, preview, zoom, col, row):
+        """用预览图快速拉伸出占位瓦片（不访问各级图片，可在主线程调用）"""
+        resample = Image.NEAREST if zoom > 1.0 else Image.BILINEAR
+        return self._resize_tile(preview, self.preview_level(), zoom, col, row, resample)
+
+    def _resize_tile(self, level_img, level, zoom, col, row, resample):
+        """从第 level 级图片中截取并缩放出一块屏幕瓦片"""
+        full_w, full_h, _, _ = self.grid_size(zoom)
+        size = self.tile_size
+
+        # 瓦片在缩放后图片中的像素范围
+        px0, py0 = col * size, row * size
+        tw = min(size, full_w - px0)
+        th = min(size, full_h - py0)
+
+        # 换算到该级图片坐标
+        factor = 2 ** level
+        lx0 = px0 / zoom / factor
+        ly0 = py0 / zoom / factor
+        lx1 = min((px0 + tw) / zoom / factor, level_img.width)
+        ly1 = min((py0 + th) / zoom / factor, level_img.height)
+
+        return level_img.resize((tw, th), resample, box=(lx0, ly0, lx1, ly1))
+
+
+class TileCache:
+    """容量有限的 LRU 瓦片缓存"""
+    def __init__(self, max_tiles=128):
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+
+    def get(self, key):
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        self.tiles[key] = tile
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.tiles
+
+    def clear(self):
+        self.tiles.clear()
+
+
+class TileLoader:
+    """后台瓦片解码线程
+
+    主线程通过 request() 提交瓦片，通过 poll() 取回解码好的 PIL 图片；
+    已离开视野的请求在解码前被丢弃。启动后首先送回 (PREVIEW_KEY, 预览图)。
+    """
+    def __init__(self, pyramid):
+        self.pyramid = pyramid
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.wanted = frozenset()
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def request(self, keys, wanted):
+        """提交待解码瓦片，wanted 为当前视野内所有瓦片"""
+        self.wanted = frozenset(wanted)
+        for key in keys:
+            self.requests.put(key)
+
+    def poll(self):
+        """取出所有已完成的瓦片 [(key, image 或 None)]"""
+        done = []
+        while True:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                return done
+
+    def stop(self):
+        """结束后台线程，丢弃尚未处理的请求"""
+        self.wanted = frozenset()
+        while True:
+            try:
+                self.requests.get_nowait()
+            except queue.Empty:
+                break
+        self.requests.put(None)
+
+    def _run(self):
+        # 先生成预览图，供主线程在缩放时拉伸出占位瓦片
+        try:
+            self.results.put((PREVIEW_KEY, self.pyramid.get_level(self.pyramid.preview_level())))
+        except Exception:
+            pass
+
+        while True:
+            key = self.requests.get()
+            if key is None:
+                # 释放已解码的各级图片
+                self.pyramid.levels.clear()
+                return
+
+            # 已不在视野内，跳过解码
+            if key not in self.wanted:
+                self.results.put((key, None))
+                continue
+
+            try:
+                tile = self.pyramid.render_tile(*key)
+            except Exception:
+                # get_level 已记录并输出失败原因
+                tile = None
+            self.results.put((key, tile))